@@ -6,7 +6,7 @@ from email.utils import parseaddr
 
 from emailinfo import *
 from receiver import ImapReceiver, Pop3Receiver
-from saver import SaverFactor
+from saver import ArchiveWriter, SaverFactor
 
 
 # 批量邮件下载类
@@ -14,6 +14,9 @@ class BatchEmail:
     def __init__(self, mode, email_server, email_address, email_password):
         self.__save_mode = 0  # 附件保存模式
         self.save_path = 'Email-Attachments'  # 附件保存位置
+        self.archive_format = ''  # 归档格式：''表示逐个保存文件，'zip'或'tar'表示写入压缩包
+        self.archive_max_size = ArchiveWriter.DEFAULT_MAX_SIZE  # 单个压缩包最大字节数，超出后新建压缩包
+        self.archive_per_folder = False  # False：每次运行一个压缩包；True：每个保存文件夹一个压缩包
 
         # 筛选属性
         self.date_begin, self.date_end = '2020-1-1 00:00', '2020-1-4 20:00'  # 筛选属性：起止时间
@@ -49,11 +52,35 @@ class BatchEmail:
             print('邮件总大小:', EmailInfo.bytes_to_readable(mail_total_size), end='\n\n')
 
         # mail_list中是各邮件信息，格式['number octets'] (1 octet = 8 bits)
-        mail_list = self.__receiver.get_mail_list()
+        # IMAP下会按到达时间倒序排列，并用二分查找裁剪到筛选时间范围，POP3忽略此条件
+        date_condition = {
+            'date_begin': DateJudge.to_timestamp(self.date_begin + self.time_zone),
+            'date_end': DateJudge.to_timestamp(self.date_end + self.time_zone),
+        }
+        mail_list = self.__receiver.get_mail_list(date_condition)
+
+        if not self.archive_format:
+            error_count = self.__download_mail_list(mail_list)
+        else:
+            archive = ArchiveWriter(self.save_path, self.archive_format, self.archive_max_size,
+                                    self.archive_per_folder)
+            self.__saver_factor.set_archive(archive)
+            try:
+                error_count = self.__download_mail_list(mail_list)
+            finally:
+                archive.close()
+                self.__saver_factor.set_archive(None)
+
+        print('处理完成')
+        if error_count > 0:
+            print('有 %d 个邮件发生错误，请手动检查' % error_count)
+
+    # 遍历邮件列表，筛选并保存附件，返回出错的邮件数量
+    def __download_mail_list(self, mail_list):
         error_count = 0
 
         # 倒序读取（从最新的开始）
-        for mail_number in mail_list:
+        for mail_index, mail_number in enumerate(mail_list):
             # mail_number = '2075'     # debug
             try:
                 content_byte = self.__receiver.get_mail_header_bytes(mail_number)
@@ -74,8 +101,10 @@ class BatchEmail:
             if self.to_name:
                 email_filter.add_judge(RecipientNameJudge(self.to_name, message_info.to_names))
 
-            # 超出设定的最早时间则结束循环
+            # 超出设定的最早时间则结束循环。列表已由接收类裁剪时，邮件头Date与列表顺序不一定一致，只跳过该邮件
             if DateJudge.is_earlier(message_info.date, self.date_begin + self.time_zone):
+                if self.__receiver.is_date_trimmed():
+                    continue
                 break
 
             if email_filter.judge_conditions():
@@ -84,15 +113,13 @@ class BatchEmail:
                 file_number = self.__save_email_attachments(mail_message, message_info)
 
                 print('( %d / %d )【%s】' % (
-                    len(mail_list) - int(mail_number) + 1, len(mail_list), message_info.subject), end='')
+                    mail_index + 1, len(mail_list), message_info.subject), end='')
                 print('已保存，下一封') if file_number != 0 else print('无附件')
                 message_info.print_info()
             else:
                 print( datetime.datetime.fromtimestamp(message_info.date), '( %d / %d )【%s】不符合筛选条件，下一封' % (
-                    len(mail_list) - int(mail_number) + 1, len(mail_list), message_info.subject))
-        print('处理完成')
-        if error_count > 0:
-            print('有 %d 个邮件发生错误，请手动检查' % error_count)
+                    mail_index + 1, len(mail_list), message_info.subject))
+        return error_count
 
     def close(self):
         self.__receiver.close()
@@ -61,14 +61,19 @@ class DateJudge(EmailJudge):
     def judge(self):
         # Date格式'4 Jan 2020 11:59:25 +0800'
         date_mail = self.__email_date
-        date_begin = datetime.datetime.strptime((self.__date_begin + self.__time_zone), '%Y-%m-%d %H:%M%z').timestamp()
-        date_end = datetime.datetime.strptime((self.__date_end + self.__time_zone), '%Y-%m-%d %H:%M%z').timestamp()
+        date_begin = DateJudge.to_timestamp(self.__date_begin + self.__time_zone)
+        date_end = DateJudge.to_timestamp(self.__date_end + self.__time_zone)
         return date_begin < date_mail < date_end
 
     @staticmethod
     # 比较是否比Target时间更早，用于结束邮件遍历的循环。包含时区。
     def is_earlier(email_time, target_time):
-        return email_time < datetime.datetime.strptime(target_time, '%Y-%m-%d %H:%M%z').timestamp()
+        return email_time < DateJudge.to_timestamp(target_time)
+
+    @staticmethod
+    # 将设置中的时间（含时区）转为时间戳，格式'2020-1-1 00:00+0800'
+    def to_timestamp(date_time):
+        return datetime.datetime.strptime(date_time, '%Y-%m-%d %H:%M%z').timestamp()
 
 
 # 邮件主题判断
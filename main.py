@@ -57,6 +57,14 @@ TO_NAME = ''
 """
 SAVE_MODE = 1
 
+# 归档格式：''表示每个附件单独保存为文件；'zip'或'tar'表示写入压缩包，压缩包内保持上述保存模式的目录结构
+# 附件数量很多时（尤其是网络存储上），写入压缩包可避免创建大量小文件
+ARCHIVE_FORMAT = ''
+# 单个压缩包最大字节数，超出后自动新建压缩包
+ARCHIVE_MAX_SIZE = 1024 * 1024 * 1024
+# False：每次运行生成一个压缩包；True：保存模式的每个文件夹生成一个压缩包（文件夹很多时仍会产生大量文件，建议False）
+ARCHIVE_PER_FOLDER = False
+
 # ************************请设置以上参数************************
 
 
@@ -67,6 +75,9 @@ if __name__ == '__main__':
     # 选项设置
     downloader.set_save_mode(SAVE_MODE)
     downloader.save_path = SAVE_PATH
+    downloader.archive_format = ARCHIVE_FORMAT
+    downloader.archive_max_size = ARCHIVE_MAX_SIZE
+    downloader.archive_per_folder = ARCHIVE_PER_FOLDER
     downloader.date_begin = DATE_BEGIN
     downloader.date_end = DATE_END
     downloader.time_zone = TIME_ZONE
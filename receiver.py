@@ -1,11 +1,18 @@
+import bisect
 import imaplib
 import poplib
 import re
+import time
 
 
 # IMAP4协议 邮件接收类
 class ImapReceiver:
+    __FETCH_BATCH_SIZE = 500  # 批量FETCH INTERNALDATE时每批的邮件数量
+    __DATE_MARGIN = 24 * 60 * 60  # INTERNALDATE与邮件头Date的容许偏差（秒）
+
     def __init__(self, host: str, email_address: str, email_password: str):
+        self.__internal_dates = {}  # 邮件编号 -> INTERNALDATE时间戳缓存
+        self.__date_trimmed = False  # get_mail_list是否已按时间范围裁剪列表
         # 连接IMAP4服务器(SSL):
         try:
             self.__connection = imaplib.IMAP4_SSL(host)
@@ -29,11 +36,109 @@ class ImapReceiver:
         return quantity, -1
 
     def get_mail_list(self, condition: dict = None):
+        """
+        返回按到达时间倒序（从最新的开始）排列的邮件编号列表
+        condition可包含'date_begin'、'date_end'（时间戳），列表将被裁剪到该时间范围附近
+        """
         self.__connection.select()
         # TODO IMAP协议支持搜索，可以把筛选条件放到这里。不过国内大多邮箱服务器不支持搜索操作。
-        # NOTE 有些邮箱SEARCH的结果不一定是有序的
-        response, mail_list = self.__connection.search(None, '(ALL)')
-        return [x.decode() for x in reversed(mail_list[0].split())]
+        # NOTE 有些邮箱SEARCH的结果不一定是有序的，因此优先使用SORT，不支持时按INTERNALDATE排序
+        self.__internal_dates = {}
+        self.__date_trimmed = False
+        mail_list = self.__sort_by_arrival()
+        sorted_by_server = mail_list is not None
+        if not sorted_by_server:
+            mail_list = self.__sort_by_internal_date()
+
+        if condition:
+            date_begin, date_end = condition.get('date_begin'), condition.get('date_end')
+            try:
+                mail_list = self.__trim_to_date_window(mail_list, date_begin, date_end, sorted_by_server)
+            except ValueError:
+                # SORT结果中有邮件取不到INTERNALDATE，无法确定其位置，改为本地排序后再裁剪
+                mail_list = self.__trim_to_date_window(self.__sort_by_internal_date(), date_begin, date_end, False)
+            self.__date_trimmed = date_begin is not None
+        return mail_list
+
+    # 邮件列表是否已裁剪到起始时间之后。已裁剪时列表按INTERNALDATE排序，不能依据邮件头Date提前结束遍历
+    def is_date_trimmed(self):
+        return self.__date_trimmed
+
+    # 使用SORT扩展按到达时间倒序排列，服务器不支持时返回None
+    # 不检查capabilities：它是登录前获取的，很多服务器登录后才声明SORT，因此直接由服务器的响应决定
+    def __sort_by_arrival(self):
+        try:
+            response, data = self.__connection.sort('(REVERSE ARRIVAL)', 'UTF-8', 'ALL')
+        except imaplib.IMAP4.error:
+            return None
+        if response != 'OK':
+            return None
+        return [x.decode() for x in data[0].split()]
+
+    # 分批FETCH所有邮件的INTERNALDATE，按其倒序排列
+    def __sort_by_internal_date(self):
+        response, data = self.__connection.search(None, '(ALL)')
+        mail_list = [x.decode() for x in data[0].split()]
+        for i in range(0, len(mail_list), ImapReceiver.__FETCH_BATCH_SIZE):
+            batch = mail_list[i:i + ImapReceiver.__FETCH_BATCH_SIZE]
+            response, data = self.__connection.fetch(','.join(batch), '(INTERNALDATE)')
+            for line in data:
+                if isinstance(line, tuple):
+                    line = line[0]
+                mail_number, internal_date = self.__parse_internal_date(line)
+                if mail_number is not None:
+                    self.__internal_dates[mail_number] = internal_date
+        # 没有取到时间的邮件视为最新，保证不会被提前结束的遍历漏掉
+        # 同一时间的邮件按编号倒序，与SEARCH结果有序时的行为一致
+        return sorted(mail_list, key=lambda x: (self.__sort_date(x), int(x)), reverse=True)
+
+    def __sort_date(self, mail_number: str):
+        internal_date = self.__internal_dates.get(mail_number)
+        return float('inf') if internal_date is None else internal_date
+
+    # 二分查找时间范围在倒序列表中的起止位置，只保留范围内的邮件，每次探测仅FETCH一封邮件的INTERNALDATE
+    # SORT的结果中探测到没有INTERNALDATE的邮件时无法确定其位置，抛出ValueError
+    def __trim_to_date_window(self, mail_list, date_begin, date_end, sorted_by_server):
+        undated_list = []
+        if not sorted_by_server:
+            # 本地排序时没有INTERNALDATE的邮件都排在最前，无法判断是否在范围内，全部保留，由邮件头Date筛选
+            undated_count = 0
+            while undated_count < len(mail_list) and self.__internal_dates.get(mail_list[undated_count]) is None:
+                undated_count += 1
+            undated_list, mail_list = mail_list[:undated_count], mail_list[undated_count:]
+
+        def date_key(mail_number):
+            internal_date = self.__get_internal_date(mail_number)
+            if internal_date is None:
+                raise ValueError('邮件 %s 的INTERNALDATE获取失败' % mail_number)
+            # 列表按时间倒序，取负数后为升序，便于使用bisect
+            return -internal_date
+
+        dates = _LazyList(mail_list, date_key)
+        start, end = 0, len(mail_list)
+        # INTERNALDATE是服务器收件时间，与邮件头Date可能有偏差，放宽范围，由邮件头Date做最终筛选
+        if date_end is not None:
+            start = bisect.bisect_left(dates, -(date_end + ImapReceiver.__DATE_MARGIN))
+        if date_begin is not None:
+            end = bisect.bisect_right(dates, -(date_begin - ImapReceiver.__DATE_MARGIN), lo=start)
+        return undated_list + mail_list[start:end]
+
+    def __get_internal_date(self, mail_number: str):
+        if mail_number not in self.__internal_dates:
+            response, data = self.__connection.fetch(mail_number, '(INTERNALDATE)')
+            line = data[0][0] if isinstance(data[0], tuple) else data[0]
+            self.__internal_dates[mail_number] = self.__parse_internal_date(line)[1]
+        return self.__internal_dates[mail_number]
+
+    @staticmethod
+    # 解析FETCH返回的INTERNALDATE，格式b'12 (INTERNALDATE "17-Jul-1996 02:44:25 -0700")'，返回(邮件编号, 时间戳)
+    def __parse_internal_date(line):
+        if not line:
+            return None, None
+        mail_number = re.match(rb'\d+', line)
+        date_tuple = imaplib.Internaldate2tuple(line)
+        return (mail_number.group().decode() if mail_number else None,
+                time.mktime(date_tuple) if date_tuple else None)
 
     def get_mail_header_bytes(self, mail_number: str):
         response, data = self.__connection.fetch(mail_number, '(BODY[HEADER])')
@@ -56,6 +161,19 @@ class ImapReceiver:
             self.__connection = None
 
 
+# 按需计算元素的只读序列，供bisect在二分查找时只探测用到的位置
+class _LazyList:
+    def __init__(self, items, key):
+        self.__items = items
+        self.__key = key
+
+    def __len__(self):
+        return len(self.__items)
+
+    def __getitem__(self, index):
+        return self.__key(self.__items[index])
+
+
 # POP3协议 邮件接收类
 class Pop3Receiver:
     def __init__(self, host: str, email_address: str, email_password: str):
@@ -91,6 +209,10 @@ class Pop3Receiver:
     def get_email_status(self):
         return self.__connection.stat()
 
+    # POP3不裁剪邮件列表，按编号倒序即为时间倒序，可以依据邮件头Date提前结束遍历
+    def is_date_trimmed(self):
+        return False
+
     def get_mail_header_bytes(self, mail_number: str):
         # TOP命令接收前n行，此处仅读取邮件属性，读部分数据可加快速度。TOP非所有服务器支持，若不支持请使用RETR。
         response, content_byte, octets = self.__connection.top(mail_number, 40)
@@ -1,7 +1,12 @@
 import abc
+import collections
 import datetime
+import io
 import os
 import re
+import tarfile
+import time
+import zipfile
 
 from emailinfo import EmailInfo
 
@@ -15,9 +20,18 @@ class Saver(metaclass=abc.ABCMeta):
         self._root_path = root_path
         self._file_name = file_name
         self._file_data = file_data
+        self._archive = None
+
+    # 设置归档器，设置后附件写入压缩包而不是单独的文件
+    def set_archive(self, archive):
+        self._archive = archive
 
     def _save_file(self, directory_path):
         # 储存文件，directory_path是绝对路径，不包含文件名
+        if self._archive is not None:
+            directory = os.path.relpath(directory_path, self._root_path)
+            self._file_name = self._archive.write(directory, self._file_name, self._file_data)
+            return
         if not os.path.exists(directory_path):
             os.makedirs(directory_path)
         self._file_name = Saver.file_name_check_and_update(directory_path, self._file_name)
@@ -111,12 +125,134 @@ class DateSubjectClassifySaver(Saver):
             os.path.join(self._root_path, self._email_date + "_" + self._email_subject)
         )
 
+# 附件归档器：将附件顺序写入滚动的ZIP/tar压缩包，避免大量小文件的元数据开销
+class ArchiveWriter:
+    ARCHIVE_FORMATS = ('zip', 'tar')
+    DEFAULT_MAX_SIZE = 1024 * 1024 * 1024  # 单个压缩包默认上限1GB，超出后新建压缩包
+    __MAX_OPEN_ARCHIVES = 64  # 同时打开的压缩包数量上限，超出时关闭最久未使用的，再次写入时以追加模式打开
+
+    def __init__(self, root_path, archive_format='zip', max_size=DEFAULT_MAX_SIZE, per_folder=False):
+        """
+        archive_format  压缩包格式，'zip'或'tar'
+        max_size        单个压缩包的最大字节数，写入后超出则滚动到下一个压缩包
+        per_folder      False：整个运行一个压缩包；True：每个保存模式的文件夹一个压缩包
+        """
+        if archive_format not in ArchiveWriter.ARCHIVE_FORMATS:
+            raise ValueError('不支持的压缩包格式：%s' % archive_format)
+        self.__root_path = root_path
+        self.__format = archive_format
+        self.__max_size = max_size
+        self.__per_folder = per_folder
+        self.__run_name = 'attachments_' + time.strftime('%Y%m%d-%H%M%S')
+        self.__archives = {}  # 压缩包键 -> [压缩包对象(已关闭为None), 已写入字节数, 序号, 路径]
+        self.__open_keys = collections.OrderedDict()  # 当前打开的压缩包键，按最近使用排序
+        self.__exist_names = {}  # 压缩包键 -> 已写入的文件路径集合，代替os.listdir做重名检查
+
+    # 写入一个附件，directory是相对root_path的文件夹。返回最终使用的文件名（不含路径）
+    def write(self, directory, file_name, file_data):
+        directory = '' if directory == os.curdir else directory.replace(os.sep, '/')
+        if self.__per_folder:
+            key, inner_directory = directory, ''
+        else:
+            key, inner_directory = '', directory
+
+        exist_names = self.__exist_names.setdefault(key, set())
+        file_name = ArchiveWriter.__unique_name(exist_names, inner_directory, file_name)
+        arcname = inner_directory + '/' + file_name if inner_directory else file_name
+        exist_names.add(arcname)
+
+        archive = self.__archives.get(key)
+        if archive is None:
+            archive = self.__open_archive(key, 1)
+        elif archive[1] > 0 and archive[1] + len(file_data) > self.__max_size:
+            self.__close_archive(key)
+            archive = self.__open_archive(key, archive[2] + 1)
+        elif archive[0] is None:
+            archive[0] = self.__open_file(key, archive[3], 'a')
+        else:
+            self.__open_keys.move_to_end(key)
+
+        if self.__format == 'zip':
+            # 附件多为已压缩格式，直接存储，保持顺序写入；中央目录由zipfile随写入增量维护，关闭时写出
+            archive[0].writestr(zipfile.ZipInfo(arcname, time.localtime()[:6]), file_data)
+        else:
+            tar_info = tarfile.TarInfo(arcname)
+            tar_info.size = len(file_data)
+            tar_info.mtime = int(time.time())
+            archive[0].addfile(tar_info, io.BytesIO(file_data))
+        archive[1] += len(file_data)
+        return file_name
+
+    def close(self):
+        for key in list(self.__open_keys):
+            self.__close_archive(key)
+        self.__archives.clear()
+
+    def __open_archive(self, key, index):
+        if key:
+            archive_base_path = os.path.join(self.__root_path, *key.split('/'))
+        else:
+            archive_base_path = os.path.join(self.__root_path, self.__run_name)
+        # 序号跳过磁盘上已存在的压缩包，与普通文件模式一样不覆盖之前运行的结果
+        archive_path = '%s_%03d.%s' % (archive_base_path, index, self.__format)
+        while os.path.exists(archive_path):
+            index += 1
+            archive_path = '%s_%03d.%s' % (archive_base_path, index, self.__format)
+        directory_path = os.path.dirname(archive_path)
+        if not os.path.exists(directory_path):
+            os.makedirs(directory_path)
+
+        archive = [self.__open_file(key, archive_path, 'w'), 0, index, archive_path]
+        self.__archives[key] = archive
+        return archive
+
+    # 打开压缩包文件并记为最近使用，打开数量达到上限时先关闭最久未使用的压缩包
+    def __open_file(self, key, archive_path, mode):
+        while len(self.__open_keys) >= ArchiveWriter.__MAX_OPEN_ARCHIVES:
+            self.__close_archive(next(iter(self.__open_keys)))
+        if self.__format == 'zip':
+            archive_file = zipfile.ZipFile(archive_path, mode, zipfile.ZIP_STORED)
+        else:
+            archive_file = tarfile.open(archive_path, mode)
+        self.__open_keys[key] = True
+        return archive_file
+
+    def __close_archive(self, key):
+        archive = self.__archives[key]
+        if archive[0] is not None:
+            archive[0].close()
+            archive[0] = None
+        self.__open_keys.pop(key, None)
+
+    @staticmethod
+    # 与Saver.file_name_check_and_update相同的递增编号规则，但基于内存中的文件名集合
+    def __unique_name(exist_names, directory, file_name):
+        file_number = 2
+        pure_name, extension = os.path.splitext(file_name)
+        candidate = file_name
+        while (directory + '/' + candidate if directory else candidate) in exist_names:
+            candidate = pure_name + '_' + str(file_number) + extension
+            file_number += 1
+        return candidate
+
+
 # 储存器工厂
 class SaverFactor:
     def __init__(self, mode: int):
         self.__mode = mode
+        self.__archive = None
+
+    # 设置归档器，None表示按普通文件保存
+    def set_archive(self, archive: ArchiveWriter):
+        self.__archive = archive
 
     def __call__(self, root_path, file_name, file_data, email_info: EmailInfo):
+        saver = self.__create_saver(root_path, file_name, file_data, email_info)
+        if saver is not None and self.__archive is not None:
+            saver.set_archive(self.__archive)
+        return saver
+
+    def __create_saver(self, root_path, file_name, file_data, email_info: EmailInfo):
         """
             保存模式    SAVE_MODE
         【0：所有附件存入一个文件夹】
@@ -124,6 +260,7 @@ class SaverFactor:
         【2：每个邮件主题一个文件夹】
         【3：每个发件人的每个邮件主题一个文件夹】
         【4：每个发件人昵称一个文件夹】
+        【5：每个邮件主题+日期前缀一个文件夹】
         """
         if self.__mode == 0:
             return MergeSaver(root_path, file_name, file_data)